@@ -10,11 +10,20 @@ you can read from and write to different worksheets, using various data types.
 Written by Jack White.
 """
 
+import csv
+import struct
+from itertools import islice
+
 from openpyxl import Workbook, load_workbook
 
 # workbooks to be stored in python dictionary, workbookNames are the keys
 wbs = {}
 
+# pending column/row insertions and heading values for each worksheet, to be
+# applied in one pass the next time the worksheet is used or saved.
+# Worksheet objects are the keys.
+insertions = {}
+
 ##############################################################################
 ############################# Workbook Functions #############################
 ##############################################################################
@@ -32,6 +41,9 @@ def create_file(newWorkbookName):
     wb = Workbook()
     
     try:
+        # forget insertions of any wb being replaced
+        _forget_insertions(wbs.get(newWorkbookName))
+        
         # Add new wb to wbs dictionary
         wbs[newWorkbookName] = wb
     except:
@@ -54,6 +66,9 @@ def load_file(newWorkbookName, filePath):
     try:
         wb = load_workbook(filePath)
         
+        # forget insertions of any wb being replaced
+        _forget_insertions(wbs.get(newWorkbookName))
+        
         # Add new wb to wbs dictionary
         wbs[newWorkbookName] = wb
     except:
@@ -85,6 +100,20 @@ def _set_active_file(workbookName):
     
     return wb
 
+# Internal Function - LabVIEW Function Not Available
+def _forget_insertions(wb):
+    """
+    Drop the pending insertions of every worksheet in a workbook, without
+    applying them.
+    
+    :param wb: the workbook being closed or replaced, or None
+    :type wb: workbook object
+    """
+    
+    if wb is not None:
+        for ws in wb.worksheets:
+            insertions.pop(ws, None)
+
 # LabVIEW Function Available
 def save_file(workbookName, filePath):
     """
@@ -104,6 +133,10 @@ def save_file(workbookName, filePath):
     wb = _set_active_file(workbookName)
     
     try:
+        # move cells for any insertions not yet applied
+        for ws in wb.worksheets:
+            _apply_insertions(ws)
+        
         wb.save(filePath)
     except:
         raise Exception("File failed to save, may be open") # possible error
@@ -119,7 +152,9 @@ def close_file(workbookName):
     """
     
     global wbs
-    wbs.pop(workbookName, None)
+    
+    # forget any insertions not yet applied
+    _forget_insertions(wbs.pop(workbookName, None))
 
 # LabVIEW Function Available
 def close_all():
@@ -127,8 +162,9 @@ def close_all():
     Delete all workbooks from memory - remove from workbooks dictionary.
     """
     
-    global wbs
+    global wbs, insertions
     wbs = {}
+    insertions = {}
 
 ##############################################################################
 ############################ Worksheet Functions #############################
@@ -170,13 +206,112 @@ def _set_active_sheet(workbookName, worksheetName):
     # need to return something here to be used in other functions
     wb.active = wb[worksheetName]
     
+    # cells must be in their final place before they are read or written
+    _apply_insertions(wb.active)
+    
     return wb.active
 
+# Internal Function - LabVIEW Function Not Available
+def _get_insertions(workbookName, worksheetName):
+    """
+    Get the pending insertions of the selected worksheet, without moving any
+    cells.
+    
+    :param workbookName: the selected workbook name
+    :type workbookName: string
+    
+    :param worksheetName: the selected worksheet name
+    :type worksheetName: string
+    
+    :rtype: dictionary of "cols", "rows" and "values"
+    """
+    
+    # set active workbook and worksheet, but don't apply insertions via
+    # _set_active_sheet
+    wb = _set_active_file(workbookName)
+    wb.active = wb[worksheetName]
+    ws = wb.active
+    
+    # cols and rows are lists of (index, amount), in the order inserted.
+    # values are {(row,col): value} to write after the cells have moved.
+    return insertions.setdefault(ws, {"cols": [], "rows": [], "values": {}})
+
+# Internal Function - LabVIEW Function Not Available
+def _shift_index(index, inserts):
+    """
+    Get the new index of a column or row after a list of insertions.
+    
+    :param index: the column or row index before the insertions
+    :type index: int
+    
+    :param inserts: list of (index, amount), in the order inserted
+    :type inserts: list of tuples
+    
+    :rtype: int
+    """
+    
+    for insertIndex, amount in inserts:
+        if index >= insertIndex:
+            index += amount
+    
+    return index
+
+# Internal Function - LabVIEW Function Not Available
+def _apply_insertions(ws):
+    """
+    Move all cells of the worksheet for its pending insertions, then write the
+    pending values.
+    
+    **Note:** openpyxl's insert_cols() and insert_rows() move every cell once
+    per call. Here every cell is moved once, however many insertions are
+    pending.
+    
+    :param ws: the selected worksheet
+    :type ws: worksheet object
+    """
+    
+    pending = insertions.pop(ws, None)
+    
+    if pending is None:
+        return
+    
+    cols = pending["cols"]
+    rows = pending["rows"]
+    
+    if cols or rows:
+        # new index of each row and column in use, found once rather than
+        # once per cell
+        newRows = {}
+        newCols = {}
+        for row, col in ws._cells:
+            if row not in newRows:
+                newRows[row] = _shift_index(row, rows)
+            if col not in newCols:
+                newCols[col] = _shift_index(col, cols)
+        
+        # rebuild the cell dictionary with every cell in its new place
+        cells = {}
+        for (row, col), cell in ws._cells.items():
+            cell.row = newRows[row]
+            cell.column = newCols[col]
+            cells[(cell.row, cell.column)] = cell
+        ws._cells = cells
+        
+        # as in openpyxl's insert_rows(), append() continues after the last row
+        if rows:
+            ws._current_row = ws.max_row
+    
+    for (row, col), value in pending["values"].items():
+        ws.cell(row=row, column=col, value=value)
+
 # Internal Function - LabVIEW Function Not Available
 def _insert_cols(workbookName, worksheetName, columnIndex, amount=1):
     """
     Insert an amount of columns before columnIndex.
     
+    **Note:** no cells are moved here. The insertion is recorded and applied,
+    with any others, the next time the worksheet is used or saved.
+    
     :param workbookName: the selected workbook name
     :type workbookName: string
     
@@ -189,21 +324,30 @@ def _insert_cols(workbookName, worksheetName, columnIndex, amount=1):
     
     :param amount: the number of columns to insert
     :type amount: int
+    
+    :rtype: dictionary of pending insertions, see _get_insertions()
     """
     
-    # set active workbook and worksheet
-    ws = _set_active_sheet(workbookName, worksheetName)
+    pending = _get_insertions(workbookName, worksheetName)
+    
+    # record column insertion before columnIndex
+    pending["cols"].append((columnIndex, amount))
     
-    # insert column before columnIndex
-    ws.insert_cols(columnIndex, amount)
+    # pending values are already in inserted coords, so must move too
+    pending["values"] = {(row, col + amount if col >= columnIndex else col):
+                         value
+                         for (row, col), value in pending["values"].items()}
     
-    return ws
+    return pending
 
 # Internal Function - LabVIEW Function Not Available
 def _insert_rows(workbookName, worksheetName, rowIndex, amount=1):
     """
     Insert an amount of rows before rowIndex.
     
+    **Note:** no cells are moved here. The insertion is recorded and applied,
+    with any others, the next time the worksheet is used or saved.
+    
     :param workbookName: the selected workbook name
     :type workbookName: string
     
@@ -215,13 +359,21 @@ def _insert_rows(workbookName, worksheetName, rowIndex, amount=1):
     
     :param amount: the number of columns to insert
     :type amount: int
+    
+    :rtype: dictionary of pending insertions, see _get_insertions()
     """
     
-    # set active workbook and worksheet
-    ws = _set_active_sheet(workbookName, worksheetName)
+    pending = _get_insertions(workbookName, worksheetName)
+    
+    # record row insertion before rowIndex
+    pending["rows"].append((rowIndex, amount))
     
-    # insert row before rowIndex
-    ws.insert_rows(rowIndex, amount)
+    # pending values are already in inserted coords, so must move too
+    pending["values"] = {(row + amount if row >= rowIndex else row, col):
+                         value
+                         for (row, col), value in pending["values"].items()}
+    
+    return pending
 
 # LabVIEW Function Available
 def create_worksheet(workbookName, newWorksheetName):
@@ -521,12 +673,13 @@ def row_headings(workbookName, worksheetName, headings,
     :type columnIndex: int
     """
     
-    # set active workbook and worksheet, and insert new column
-    ws = _insert_cols(workbookName, worksheetName, columnIndex)
+    # record new column insertion, cells are moved later in one pass
+    pending = _insert_cols(workbookName, worksheetName, columnIndex)
     
-    # add row headings one by one to new column, starting from rowStart
+    # add row headings one by one to new column, starting from rowStart,
+    # to be written once the cells have moved
     for i, heading in enumerate(headings):
-        ws.cell(row=rowStart + i, column=columnIndex, value=heading)
+        pending["values"][(rowStart + i, columnIndex)] = heading
 
 ##############################################################################
 ############################ Data Read Functions #############################
@@ -690,3 +843,271 @@ def get_all_data(workbookName, worksheetName):
         data.append(rowData)
     
     return data
+
+##############################################################################
+########################### Data Export Functions ############################
+##############################################################################
+
+# Internal Function - LabVIEW Function Not Available
+def _write_csv(rows, path):
+    """
+    Write rows of values to a CSV file, one row at a time.
+    
+    Empty cells (None) are written as empty fields by csv.writer.
+    
+    :param rows: iterable of rows of cell values
+    :type rows: generator of tuples
+    
+    :param path: file path (or local name) of the file to be written
+    :type path: string
+    """
+    
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        for row in rows:
+            writer.writerow(row)
+
+# Internal Function - LabVIEW Function Not Available
+def _column_type(values):
+    """
+    Get the binary type of a column, and its values packed as bytes.
+    
+    :param values: the column's values, without empty cells
+    :type values: list
+    
+    :rtype: tuple of (int, bytes)
+    """
+    
+    if not values:
+        return 0, b""
+    
+    # bool before int, as bool is a subclass of int
+    if all(isinstance(value, bool) for value in values):
+        return 6, struct.pack(">%dB" % len(values), *values)
+    
+    if all(isinstance(value, int) and not isinstance(value, bool)
+           for value in values):
+        # smallest signed int that holds every value
+        low, high = min(values), max(values)
+        for typeCode, bits, fmt in ((2, 8, "b"), (3, 16, "h"),
+                                    (4, 32, "i"), (5, 64, "q")):
+            if -2**(bits - 1) <= low and high < 2**(bits - 1):
+                return typeCode, struct.pack(">%d%s" % (len(values), fmt),
+                                             *values)
+    
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool)
+           and not (isinstance(value, int) and abs(value) > 2**53)
+           for value in values):
+        return 1, struct.pack(">%dd" % len(values), *values)
+    
+    # anything else (e.g. text, dates, mixed types) is written as strings
+    data = bytearray()
+    for value in values:
+        text = str(value).encode("utf-8")
+        data += struct.pack(">I", len(text))
+        data += text
+    return 7, bytes(data)
+
+# Internal Function - LabVIEW Function Not Available
+def _write_bin(rows, path, blockRows=1024):
+    """
+    Write rows of values to a typed, columnar binary file, one block of rows
+    at a time.
+    
+    All numbers are big-endian, which is LabVIEW's default byte order. The
+    file is a series of blocks, read until the end of the file. Each block is
+    a uint32 number of rows and a uint32 number of columns, then each column
+    in turn:
+    
+    * uint8 type
+    * uint8 1 if the column has empty cells, else 0
+    * if it has empty cells, a bitmap of one bit per row (first row is the
+      highest bit of the first byte), 1 where the cell has a value
+    * the values of the non-empty cells only, packed by type
+    
+    The types are:
+    
+    * 0 - all cells empty, no bitmap or values
+    * 1 - float64
+    * 2 - int8, 3 - int16, 4 - int32, 5 - int64
+    * 6 - boolean, as uint8
+    * 7 - string, each as uint32 byte length then UTF-8 bytes
+    
+    A column of ints uses the smallest int type that holds all its values in
+    that block. Anything that isn't all one type (e.g. text, dates, mixed
+    types) is written as strings.
+    
+    **Note:** ints take 1-8 bytes and floats 8 bytes, so numeric data is
+    usually smaller than CSV, unless floats are short decimals like 2.5.
+    Strings take 3 more bytes each than in CSV. Empty cells cost one bit. Only
+    one block of rows is held in memory at once.
+    
+    :param rows: iterable of rows of cell values
+    :type rows: generator of tuples
+    
+    :param path: file path (or local name) of the file to be written
+    :type path: string
+    
+    :param blockRows: the number of rows in each block
+    :type blockRows: int
+    """
+    
+    rows = iter(rows)
+    
+    with open(path, "wb") as file:
+        while True:
+            block = list(islice(rows, blockRows))
+            if not block:
+                break
+            
+            numrows = len(block)
+            numcols = max(len(row) for row in block)
+            file.write(struct.pack(">II", numrows, numcols))
+            
+            for x in range(numcols):
+                column = [row[x] if x < len(row) else None for row in block]
+                values = [value for value in column if value is not None]
+                typeCode, data = _column_type(values)
+                
+                hasNulls = 0 < len(values) < numrows
+                file.write(struct.pack(">BB", typeCode, hasNulls))
+                
+                if hasNulls:
+                    bitmap = bytearray((numrows + 7) // 8)
+                    for y, value in enumerate(column):
+                        if value is not None:
+                            bitmap[y // 8] |= 0x80 >> (y % 8)
+                    file.write(bitmap)
+                
+                file.write(data)
+
+# Internal Function - LabVIEW Function Not Available
+def _iter_values(ws, start, end):
+    """
+    Get the values from the start to end cell, inclusive, one row at a time.
+    
+    **Note:** openpyxl's iter_rows() and ws.values create (and keep) a cell
+    for every empty coordinate they pass over. Here rows are built from the
+    cells that already exist, with None for the gaps, so no cells are created
+    and the append position of the worksheet doesn't move.
+    
+    :param ws: the selected worksheet
+    :type ws: worksheet object
+    
+    :param start: the start cell coords in the format (col,row),
+                  e.g. (1,2) = A2
+    :type start: tuple
+    
+    :param end: the end cell coords in the format (col,row),
+                e.g. (2,3) = B3
+    :type end: tuple
+    
+    :rtype: generator of tuples
+    """
+    
+    minCol, minRow = start
+    maxCol, maxRow = end
+    
+    # existing cells in the range, in row then column order
+    keys = sorted(key for key in ws._cells
+                  if minRow <= key[0] <= maxRow and minCol <= key[1] <= maxCol)
+    
+    i = 0
+    for row in range(minRow, maxRow + 1):
+        rowData = [None] * (maxCol - minCol + 1)
+        while i < len(keys) and keys[i][0] == row:
+            rowData[keys[i][1] - minCol] = ws._cells[keys[i]].value
+            i += 1
+        yield tuple(rowData)
+
+# Internal Function - LabVIEW Function Not Available
+def _export_rows(rows, path, fileFormat):
+    """
+    Write rows of values to a file in the chosen format.
+    
+    :param rows: iterable of rows of cell values
+    :type rows: generator of tuples
+    
+    :param path: file path (or local name) of the file to be written
+    :type path: string
+    
+    :param fileFormat: "csv" or "bin", see _write_bin() for the binary layout
+    :type fileFormat: string
+    """
+    
+    writers = {"csv": _write_csv, "bin": _write_bin}
+    
+    if fileFormat not in writers:
+        raise Exception("Unknown export format, use csv or bin")
+    
+    try:
+        writers[fileFormat](rows, path)
+    except OSError:
+        raise Exception("File failed to export, may be open") # possible error
+
+# LabVIEW Function Available
+def export_sheet(workbookName, worksheetName, path, fileFormat = "csv"):
+    """
+    Write all data from the selected worksheet to a CSV or binary file.
+    
+    **Note:** rows are built and written one at a time, so unlike
+    get_all_data(), the rows are never held in memory all at once, and no
+    cells are created for empty coordinates. See _iter_values().
+    
+    :param workbookName: the selected workbook name
+    :type workbookName: string
+    
+    :param worksheetName: the selected worksheet name
+    :type worksheetName: string
+    
+    :param path: file path (or local name) of the file to be written
+    :type path: string
+    
+    :param fileFormat: "csv" or "bin", see _write_bin() for the binary layout
+    :type fileFormat: string
+    """
+    
+    # set active workbook and worksheet
+    ws = _set_active_sheet(workbookName, worksheetName)
+    
+    # from A1 to the last row and column with data, as in ws.values
+    rows = _iter_values(ws, (1, 1), (ws.max_column, ws.max_row))
+    
+    _export_rows(rows, path, fileFormat)
+
+# LabVIEW Function Available
+def export_data_from_cell_coords(workbookName, worksheetName, start, end,
+                                 path, fileFormat = "csv"):
+    """
+    Write data from the start to end cell, inclusive, to a CSV or binary file.
+    
+    **Note:** as in export_sheet(), rows are written one at a time and no
+    cells are created for empty coordinates.
+    
+    :param workbookName: the selected workbook name
+    :type workbookName: string
+    
+    :param worksheetName: the selected worksheet name
+    :type worksheetName: string
+    
+    :param start: the start cell coords in the format (col,row),
+                  e.g. (1,2) = A2
+    :type start: tuple
+    
+    :param end: the end cell coords in the format (col,row),
+                e.g. (2,3) = B3
+    :type end: tuple
+    
+    :param path: file path (or local name) of the file to be written
+    :type path: string
+    
+    :param fileFormat: "csv" or "bin", see _write_bin() for the binary layout
+    :type fileFormat: string
+    """
+    
+    # set active workbook and worksheet
+    ws = _set_active_sheet(workbookName, worksheetName)
+    
+    rows = _iter_values(ws, start, end)
+    
+    _export_rows(rows, path, fileFormat)